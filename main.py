@@ -1,6 +1,17 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import sys
+import time
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+import matplotlib
+
+NO_SHOW = "--no-show" in sys.argv
+if NO_SHOW:
+    matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import datetime as datetime  
 
@@ -19,58 +30,68 @@ CITIES = {
     "Almaty": (43.2380, 76.9450),
 }
 
+# Все параметры — числа или ASCII без спецсимволов, urlencode не нужен.
+FORECAST_URL = ("https://api.open-meteo.com/v1/forecast?"
+                "daily=temperature_2m_max&past_days={past_days}&timezone={tz}"
+                "&latitude={lat}&longitude={lon}")
+
 CITY_ALIAS = {
     "Астана": "Astana", "Нур-Султан": "Astana",
     "Алматы": "Almaty", "Алма-Ата": "Almaty"
 }
 
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 try:
     import requests
-    def fetch_json(url: str, params: dict) -> dict:
-        r = requests.get(url, params=params, timeout=30)
+    from requests.adapters import HTTPAdapter
+    _SESSION = requests.Session()
+    _SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    def fetch_json(url: str) -> dict:
+        r = _SESSION.get(url, timeout=30)
         r.raise_for_status()
-        return r.json()
+        return json_loads(r.content)
 except Exception:
     
-    import json
-    from urllib.parse import urlencode
     from urllib.request import urlopen
-    def fetch_json(url: str, params: dict) -> dict:
-        full = f"{url}?{urlencode(params)}"
-        with urlopen(full, timeout=30) as resp:
-            return json.loads(resp.read().decode("utf-8"))
+    def fetch_json(url: str) -> dict:
+        with urlopen(url, timeout=30) as resp:
+            return json_loads(resp.read())
 
 
-def load_city(name: str, lat: float, lon: float, past_days: int = PAST_DAYS) -> pd.DataFrame:
+def load_city(name: str, lat: float, lon: float, past_days: int = PAST_DAYS) -> pa.Table:
     
-    url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude":  lat,
-        "longitude": lon,
-        "daily":     "temperature_2m_max",
-        "past_days": past_days,
-        "timezone":  TIMEZONE,
-    }
-    data = fetch_json(url, params).get("daily", {})
-    return pd.DataFrame({
-        "date":        data.get("time", []),
-        "city":        name,
-        "temperature": data.get("temperature_2m_max", []),
+    url = FORECAST_URL.format(past_days=past_days, tz=TIMEZONE, lat=lat, lon=lon)
+    data = fetch_json(url).get("daily", {})
+    dates = data.get("time", [])
+    return pa.table({
+        "date":        pa.array(dates, type=pa.string()),
+        "city":        pa.array([name] * len(dates), type=pa.string()),
+        "temperature": pa.array(data.get("temperature_2m_max", []), type=pa.float64()),
     })
 
 def refresh_csv(csv_path: Path, max_age_hours: int = MAX_AGE_HOURS) -> None:
 
     need_update = not csv_path.exists()
     if not need_update:
-        age_h = (datetime.datetime.now() - datetime.datetime.fromtimestamp(csv_path.stat().st_mtime)).total_seconds()/3600
+        age_h = (time.time() - csv_path.stat().st_mtime) / 3600.0
         need_update = age_h > max_age_hours
 
     if need_update:
-        frames = [load_city(n, *coords) for n, coords in CITIES.items()]
-        df = pd.concat(frames, ignore_index=True)
+        with ThreadPoolExecutor(max_workers=len(CITIES)) as ex:
+            tables = list(ex.map(lambda kv: load_city(kv[0], *kv[1]), CITIES.items()))
+        table = pa.concat_tables(tables)
         csv_path.parent.mkdir(parents=True, exist_ok=True)
-        df.to_csv(csv_path, index=False)
+        # Заголовок пишем сами: pyarrow всегда берёт имена колонок в кавычки.
+        with open(csv_path, "wb") as f:
+            f.write((",".join(table.column_names) + "\n").encode("utf-8"))
+            pa_csv.write_csv(table, f, pa_csv.WriteOptions(include_header=False,
+                                                           quoting_style="none"))
+        csv_path.with_suffix(".parquet").unlink(missing_ok=True)
         print(f"Данные обновлены -> {csv_path} ({datetime.datetime.now():%Y-%m-%d %H:%M})")
 
 
@@ -80,63 +101,136 @@ if not csv_path.exists():
 refresh_csv(csv_path)
 
 
-need_cols = {"date", "city", "temperature"}
-df = pd.read_csv(csv_path, dtype={"date": "string", "city": "string"})
-if not need_cols.issubset(df.columns):
-    raise ValueError(f"В CSV должны быть колонки: {need_cols}. Найдены: {set(df.columns)}")
-
-df["date"] = df["date"].astype("string").str.strip()
-df["city"] = df["city"].astype("string").str.strip().replace(CITY_ALIAS)
-
-bad_tokens = {"", "...", "—", "-", "NaN", "nan", None}
-df = df[~df["date"].isin(bad_tokens)].copy()
-
-parsed_dates = pd.to_datetime(df["date"], errors="coerce", format="mixed", dayfirst=True)
-bad_mask = parsed_dates.isna()
-if bad_mask.any():
-    print("Плохие даты (первые 10):")
-    print(df.loc[bad_mask, "date"].head(10).to_string(index=False))
-    df = df.loc[~bad_mask].copy()
-    parsed_dates = parsed_dates[~bad_mask]
-
-df["date"] = parsed_dates
-df["temperature"] = pd.to_numeric(df["temperature"], errors="coerce")
-df = df.dropna(subset=["date", "city", "temperature"])
-
-
-def make_series(table: pd.DataFrame, city: str) -> pd.Series:
-    part = table.loc[table["city"] == city, ["date", "temperature"]].copy()
-    if part.empty:
+def recode_city(city: pd.Series) -> pd.Series:
+    # Чистим и переименовываем категории (их единицы), а не каждую строку столбца.
+    city = city.astype("category")
+    names = pd.Index([CITY_ALIAS.get(c.strip(), c.strip()) for c in city.cat.categories])
+    merged = names.unique()
+    remap = np.append(merged.get_indexer(names), -1)   # код -1 (NaN) остаётся -1
+    codes = remap[city.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=merged), index=city.index)
+
+
+def clean_csv(csv_path: Path) -> tuple[pd.DataFrame, str]:
+
+    need_cols = {"date", "city", "temperature"}
+    df = pd.read_csv(csv_path, engine="pyarrow", on_bad_lines="warn",
+                     dtype={"date": "string[pyarrow]", "city": "string[pyarrow]"})
+    if not need_cols.issubset(df.columns):
+        raise ValueError(f"В CSV должны быть колонки: {need_cols}. Найдены: {set(df.columns)}")
+
+    df["date"] = df["date"].str.strip()
+    df["city"] = recode_city(df["city"])
+
+    uniq = df["date"].unique()
+    if len(uniq):
+        lookup = pd.Series(pd.to_datetime(uniq, errors="coerce", format="ISO8601"), index=uniq)
+        if lookup.isna().any():
+            lookup = lookup.combine_first(
+                pd.Series(pd.to_datetime(uniq, errors="coerce", format="%d.%m.%Y"), index=uniq))
+        parsed_dates = df["date"].map(lookup)
+    else:
+        # Пустой CSV: map() по пустой строковой колонке падает в pandas 3.
+        parsed_dates = pd.to_datetime(df["date"], errors="coerce", format="ISO8601")
+    bad_mask = parsed_dates.isna()
+    bad_report = ""
+    if bad_mask.any():
+        bad_report = df.loc[bad_mask, "date"].head(10).to_string(index=False)
+        df = df.loc[~bad_mask].copy()
+        parsed_dates = parsed_dates[~bad_mask]
+
+    df["date"] = parsed_dates
+    df["temperature"] = pd.to_numeric(df["temperature"], errors="coerce", downcast="float")
+    return df.dropna(subset=["date", "city", "temperature"]), bad_report
+
+
+def load_clean(csv_path: Path) -> pd.DataFrame:
+
+    # Кэш валиден только для того же файла: mtime может уйти назад (cp -p, rsync),
+    # поэтому сверяем точные st_mtime_ns и st_size, записанные в метаданные Parquet.
+    st = csv_path.stat()
+    stamp = {b"csv_mtime_ns": str(st.st_mtime_ns).encode(), b"csv_size": str(st.st_size).encode()}
+    parquet_path = csv_path.with_suffix(".parquet")
+
+    meta = {}
+    if parquet_path.exists():
+        meta = pq.read_schema(parquet_path).metadata or {}
+    if all(meta.get(k) == v for k, v in stamp.items()):
+        df = pq.read_table(parquet_path).to_pandas()
+        bad_report = meta.get(b"bad_dates", b"").decode("utf-8")
+    else:
+        df, bad_report = clean_csv(csv_path)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table.replace_schema_metadata({
+            **(table.schema.metadata or {}), **stamp,
+            b"bad_dates": bad_report.encode("utf-8"),
+        }), parquet_path)
+
+    if bad_report:
+        print("Плохие даты (первые 10):")
+        print(bad_report)
+    return df
+
+
+df = load_clean(csv_path)
+
+
+def interpolate_daily(frame: pd.DataFrame) -> pd.DataFrame:
+    # После asfreq("D") сетка равномерная, поэтому "time" == линейная по номеру дня.
+    # Как interpolate("time", limit_area="inside"): края до первого и после
+    # последнего значения города остаются NaN.
+    vals = frame.to_numpy(dtype="float32", copy=True)
+    idx = np.arange(len(vals))
+    for j in range(vals.shape[1]):
+        col = vals[:, j]
+        good = np.flatnonzero(~np.isnan(col))
+        if good.size == 0:
+            continue
+        inside = idx[good[0]:good[-1] + 1]
+        col[inside] = np.interp(inside, good, col[good])
+    return pd.DataFrame(vals, index=frame.index, columns=frame.columns)
+
+wide = interpolate_daily(
+    df.pivot_table(index="date", columns="city", values="temperature", aggfunc="mean", observed=True)
+      .sort_index()
+      .asfreq("D"))
+for city in CITIES:
+    if city not in wide.columns:
         raise ValueError(f"Нет данных для города: {city}")
-    return (part.set_index("date")["temperature"]
-                .sort_index()
-                .asfreq("D")
-                .interpolate("time"))
-
-s_ast = make_series(df, "Astana")
-s_alm = make_series(df, "Almaty")
-
-
-def season_by_month(m: int) -> str:
-    if m in (12, 1, 2):  return "winter"
-    if m in (6, 7, 8):   return "summer"
-    return "shoulder"
-
-last_date = min(s_ast.dropna().index.max(), s_alm.dropna().index.max())
-t_ast = float(s_ast.loc[last_date])
-t_alm = float(s_alm.loc[last_date])
-
-season = season_by_month(last_date.month)
-if season == "winter":
-    winner = "Astana" if t_ast > t_alm else "Almaty"
-    reason = "зима: теплее — комфортнее"
-elif season == "summer":
-    winner = "Astana" if t_ast < t_alm else "Almaty"
-    reason = "лето: прохладнее — комфортнее"
-else:
-    target = 20.0
-    winner = "Astana" if abs(t_ast - target) <= abs(t_alm - target) else "Almaty"
-    reason = f"межсезонье: ближе к {target:.0f}C — комфортнее"
+
+s_ast, s_alm = wide["Astana"], wide["Almaty"]
+
+
+COMFORT_TARGET = 20.0
+# Сезон по номеру месяца (январь..декабрь): 0 — зима, 1 — лето, 2 — межсезонье.
+SEASON = np.array([0, 0, 2, 2, 2, 1, 1, 1, 2, 2, 2, 0])
+SEASON_REASON = (
+    "зима: теплее — комфортнее",
+    "лето: прохладнее — комфортнее",
+    f"межсезонье: ближе к {COMFORT_TARGET:.0f}C — комфортнее",
+)
+
+def astana_wins(month, t_ast, t_alm) -> np.ndarray:
+    # Без ветвлений: считаем все три правила и выбираем по коду сезона.
+    t_ast, t_alm = np.asarray(t_ast), np.asarray(t_alm)
+    return np.choose(SEASON[np.asarray(month) - 1], [
+        t_ast > t_alm,
+        t_ast < t_alm,
+        np.abs(t_ast - COMFORT_TARGET) <= np.abs(t_alm - COMFORT_TARGET),
+    ])
+
+vals_ast, vals_alm = s_ast.to_numpy(), s_alm.to_numpy()
+common = np.flatnonzero(~np.isnan(vals_ast) & ~np.isnan(vals_alm))
+if common.size == 0:
+    raise ValueError("Нет общих дат с данными для обоих городов")
+last_i = common[-1]
+# В float32 22.05 хранится как 22.0499..., и :.1f дал бы 22.0. Берём кратчайшую
+# десятичную запись float32, чтобы сравнение и вывод шли по исходным значениям.
+t_ast, t_alm = (float(np.format_float_positional(v)) for v in (vals_ast[last_i], vals_alm[last_i]))
+last_date = s_ast.index[last_i]
+
+winner = "Astana" if astana_wins(last_date.month, t_ast, t_alm) else "Almaty"
+reason = SEASON_REASON[SEASON[last_date.month - 1]]
 
 print(f"{last_date.date()}: Astana {t_ast:.1f}C vs Almaty {t_alm:.1f}C -> комфортнее в {winner} ({reason}).")
 
@@ -157,9 +251,10 @@ fig.tight_layout()
 fig.savefig(out, dpi=150, bbox_inches="tight")
 print(f"OK -> {out}")
 
-def on_key(event):
-    if event.key and event.key.lower() == "q":
-        plt.close(event.canvas.figure)
+if not NO_SHOW:
+    def on_key(event):
+        if event.key and event.key.lower() == "q":
+            plt.close(event.canvas.figure)
 
-fig.canvas.mpl_connect("key_press_event", on_key)
-plt.show()
+    fig.canvas.mpl_connect("key_press_event", on_key)
+    plt.show()
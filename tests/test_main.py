@@ -0,0 +1,128 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+MAIN = Path(__file__).resolve().parent.parent / "main.py"
+
+
+def run_main(tmp_path: Path, csv_text: str) -> subprocess.CompletedProcess:
+    # Свежий CSV не устаревает, поэтому refresh_csv не ходит в сеть.
+    (tmp_path / "data").mkdir(exist_ok=True)
+    (tmp_path / "data" / "Weather.csv").write_text(csv_text, encoding="utf-8")
+    return run_again(tmp_path)
+
+
+def run_again(tmp_path: Path) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, str(MAIN), "--no-show"],
+        cwd=tmp_path, capture_output=True, text=True, encoding="utf-8",
+    )
+
+
+def test_compares_last_common_date(tmp_path):
+    res = run_main(tmp_path, "\n".join([
+        "date,city,temperature",
+        "2025-01-09,Astana,-10",
+        "2025-01-10,Astana,-5",
+        "2025-01-11,Astana,-12",
+        "2025-01-09,Almaty,0",
+        "2025-01-10,Almaty,0.5",
+        "2025-01-11,Almaty,1",
+        "2025-01-12,Almaty,2",
+        "2025-01-13,Almaty,3",
+    ]) + "\n")
+    assert res.returncode == 0, res.stderr
+    assert "2025-01-11: Astana -12.0C vs Almaty 1.0C" in res.stdout
+
+
+def test_interpolates_inner_gap(tmp_path):
+    res = run_main(tmp_path, "\n".join([
+        "date,city,temperature",
+        "2025-01-09,Astana,-10",
+        "2025-01-11,Astana,-6",
+        "2025-01-09,Almaty,0",
+        "2025-01-10,Almaty,1",
+        "2025-01-11,Almaty,2",
+    ]) + "\n")
+    assert res.returncode == 0, res.stderr
+    assert "2025-01-11: Astana -6.0C vs Almaty 2.0C" in res.stdout
+
+
+def test_no_common_dates(tmp_path):
+    res = run_main(tmp_path, "\n".join([
+        "date,city,temperature",
+        "2025-01-01,Astana,-10",
+        "2025-01-02,Astana,-11",
+        "2025-01-05,Almaty,0",
+        "2025-01-06,Almaty,1",
+    ]) + "\n")
+    assert res.returncode != 0
+    assert "Нет общих дат" in res.stderr
+
+
+def test_header_only_csv(tmp_path):
+    res = run_main(tmp_path, "date,city,temperature\n")
+    assert res.returncode != 0
+    assert "Нет данных для города" in res.stderr
+
+
+def test_prints_source_precision(tmp_path):
+    res = run_main(tmp_path, "\n".join([
+        "date,city,temperature",
+        "2025-04-10,Astana,22.05",
+        "2025-04-10,Almaty,0.15",
+    ]) + "\n")
+    assert res.returncode == 0, res.stderr
+    assert "Astana 22.1C vs Almaty 0.1C" in res.stdout
+
+
+def test_repo_sample_file(tmp_path):
+    sample = MAIN.parent / "Weather.cvs"
+    res = run_main(tmp_path, sample.read_text(encoding="utf-8"))
+    assert res.returncode == 0, res.stderr
+    assert "2025-09-16: Astana 21.0C vs Almaty 24.1C" in res.stdout
+
+
+def test_cache_ignores_replaced_csv_with_older_mtime(tmp_path):
+    res = run_main(tmp_path, "date,city,temperature\n"
+                             "2025-09-17,Astana,15\n2025-09-17,Almaty,25\n")
+    assert res.returncode == 0, res.stderr
+    assert (tmp_path / "data" / "Weather.parquet").exists()
+
+    # Как после cp -p / rsync: новый файл, но mtime старше кэша.
+    csv = tmp_path / "data" / "Weather.csv"
+    csv.write_text("date,city,temperature\n2025-09-20,Astana,10\n2025-09-20,Almaty,30\n",
+                   encoding="utf-8")
+    old = (tmp_path / "data" / "Weather.parquet").stat().st_mtime - 3600
+    os.utime(csv, (old, old))
+
+    res = run_again(tmp_path)
+    assert res.returncode == 0, res.stderr
+    assert "2025-09-20: Astana 10.0C vs Almaty 30.0C" in res.stdout
+
+
+def test_cache_hit_repeats_bad_dates_report(tmp_path):
+    res = run_main(tmp_path, "date,city,temperature\n"
+                             "2025-09-17,Astana,15\n2025-09-17,Almaty,25\n"
+                             "not-a-date,Astana,0\n")
+    assert res.returncode == 0, res.stderr
+    assert "not-a-date" in res.stdout
+
+    res = run_again(tmp_path)
+    assert res.returncode == 0, res.stderr
+    assert "Плохие даты" in res.stdout and "not-a-date" in res.stdout
+
+
+def test_city_aliases_and_dotted_dates(tmp_path):
+    res = run_main(tmp_path, "\n".join([
+        "date,city,temperature",
+        "15.09.2025,Алматы,24",
+        "15.09.2025, Астана ,18",
+        "2025-09-15,Astana,20",
+        "2025-09-15,,5",
+    ]) + "\n")
+    assert res.returncode == 0, res.stderr
+    assert "Плохие даты" not in res.stdout
+    # " Астана " и "Astana" сливаются в один город, строка без города отбрасывается.
+    assert "2025-09-15: Astana 19.0C vs Almaty 24.0C" in res.stdout